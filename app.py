@@ -1,17 +1,8 @@
 import streamlit as st
-from auth import login_form, is_admin
-from deal_storage import list_deals, create_deal
+from auth import login_form, is_admin, logout
+from deal_storage import list_deals, load_deal, create_deal, deal_exists, is_valid_deal_name
 
-# ─── Page Config ───
-st.set_page_config(
-    page_title="Sales Brain",
-    page_icon="🧠",
-    layout="wide",
-    initial_sidebar_state="expanded",
-)
-
-# ─── Custom CSS ───
-st.markdown("""
+_CSS = """
 <style>
     @import url('https://fonts.googleapis.com/css2?family=Inter:wght@300;400;500;600;700;800&display=swap');
 
@@ -91,7 +82,18 @@ st.markdown("""
         padding: 1.5rem;
     }
 </style>
-""", unsafe_allow_html=True)
+"""
+
+# ─── Page Config ───
+st.set_page_config(
+    page_title="Sales Brain",
+    page_icon="🧠",
+    layout="wide",
+    initial_sidebar_state="expanded",
+)
+
+# ─── Custom CSS ───
+st.markdown(_CSS, unsafe_allow_html=True)
 
 
 # ─── Auth Gate ───
@@ -111,8 +113,7 @@ with st.sidebar:
             st.switch_page("pages/2_Settings.py")
 
     if st.button("🚪 Logout", use_container_width=True):
-        for key in list(st.session_state.keys()):
-            del st.session_state[key]
+        logout()
         st.rerun()
 
 # ─── Main Dashboard ───
@@ -131,9 +132,11 @@ with col1:
         )
         submitted = st.form_submit_button("Create Deal", use_container_width=True)
         if submitted:
-            if not new_deal_name:
+            if not new_deal_name.strip():
                 st.error("Please enter a deal name.")
-            elif new_deal_name in list_deals(st.session_state["username"]):
+            elif not is_valid_deal_name(new_deal_name):
+                st.error("Deal names can't start with '.' or contain '/', '\\' or NUL characters.")
+            elif deal_exists(new_deal_name, st.session_state["username"]):
                 st.error("A deal with this name already exists.")
             else:
                 create_deal(new_deal_name, st.session_state["username"])
@@ -166,7 +169,6 @@ with col2:
 if deals:
     st.markdown("---")
     st.markdown("### 📊 Quick Overview")
-    from deal_storage import load_deal
 
     metrics_cols = st.columns(min(len(deals), 4))
     for i, deal_name in enumerate(deals[:4]):
@@ -1,6 +1,11 @@
 import bcrypt
+import hashlib
+import hmac
 import json
 import os
+import secrets
+import threading
+from collections import OrderedDict
 import streamlit as st
 
 USERS_FILE = os.path.join(os.path.dirname(__file__), "data", "users.json")
@@ -9,13 +14,41 @@ USERS_FILE = os.path.join(os.path.dirname(__file__), "data", "users.json")
 ADMIN_USERNAME = "admin"
 ADMIN_PASSWORD_HASH = "$2b$12$mm4R9thjiT0.lJ8njlAdmecUJvk7vPacdWwzWdefT93DF1jWWXQ9W"
 
+_LOGIN_HEADER_HTML = """
+<div style="text-align: center; padding: 2rem 0;">
+    <h1 style="
+        background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
+        -webkit-background-clip: text;
+        -webkit-text-fill-color: transparent;
+        font-size: 3rem;
+        font-weight: 800;
+        margin-bottom: 0.2rem;
+    ">Sales Brain</h1>
+    <p style="color: #8892b0; font-size: 1.1rem;">RevCortex Buying Process Mastery</p>
+</div>
+"""
+
+# Successful bcrypt checks, keyed on (hash, HMAC of the password) so no
+# plaintext is kept. Failures are never stored: every wrong password costs a
+# full bcrypt, for known and unknown users alike.
+_VERIFIED_MAX_ENTRIES = 128
+_VERIFIED_DIGEST_KEY = secrets.token_bytes(32)
+_verified: OrderedDict[tuple[str, bytes], None] = OrderedDict()
+_verified_lock = threading.Lock()
+
+
+@st.cache_data(ttl=60, show_spinner=False)
+def _read_users(mtime_ns: int) -> dict:
+    """Read and parse the users file. Cached per file mtime."""
+    with open(USERS_FILE, "r") as f:
+        return json.load(f)
+
 
 def _load_users() -> dict:
     """Load users from JSON file."""
     if not os.path.exists(USERS_FILE):
         return {}
-    with open(USERS_FILE, "r") as f:
-        return json.load(f)
+    return _read_users(os.stat(USERS_FILE).st_mtime_ns)
 
 
 def _save_users(users: dict):
@@ -30,9 +63,25 @@ def hash_password(password: str) -> str:
     return bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt()).decode("utf-8")
 
 
+def _password_digest(password: str) -> bytes:
+    """Keyed digest of a password, used only as a cache key."""
+    return hmac.new(_VERIFIED_DIGEST_KEY, password.encode("utf-8"), hashlib.sha256).digest()
+
+
 def verify_password(password: str, hashed: str) -> bool:
-    """Verify a password against a bcrypt hash."""
-    return bcrypt.checkpw(password.encode("utf-8"), hashed.encode("utf-8"))
+    """Verify a password against a bcrypt hash. Repeat successes skip bcrypt."""
+    cache_key = (hashed, _password_digest(password))
+    with _verified_lock:
+        if cache_key in _verified:
+            _verified.move_to_end(cache_key)
+            return True
+    if not bcrypt.checkpw(password.encode("utf-8"), hashed.encode("utf-8")):
+        return False
+    with _verified_lock:
+        _verified[cache_key] = None
+        if len(_verified) > _VERIFIED_MAX_ENTRIES:
+            _verified.popitem(last=False)
+    return True
 
 
 def create_user(username: str, password: str) -> bool:
@@ -47,16 +96,25 @@ def create_user(username: str, password: str) -> bool:
 
 def authenticate(username: str, password: str) -> bool:
     """Authenticate a user. Checks admin first, then regular users."""
-    # Check hardcoded admin
-    if username == ADMIN_USERNAME:
+    # Check hardcoded admin (constant-time compare so timing doesn't leak the name)
+    is_admin_user = hmac.compare_digest(username.encode("utf-8"), ADMIN_USERNAME.encode("utf-8"))
+    if is_admin_user:
         return verify_password(password, ADMIN_PASSWORD_HASH)
     # Check regular users
     users = _load_users()
     if username not in users:
+        # Burn a real bcrypt check so unknown users take as long as known ones
+        bcrypt.checkpw(password.encode("utf-8"), ADMIN_PASSWORD_HASH.encode("utf-8"))
         return False
     return verify_password(password, users[username])
 
 
+def logout():
+    """Clear the current session. The verified-password cache is process-wide and
+    left alone: an entry is only hit with the correct password anyway."""
+    st.session_state.clear()
+
+
 def is_admin() -> bool:
     """Check if the current logged-in user is admin."""
     return st.session_state.get("username") == ADMIN_USERNAME
@@ -68,22 +126,7 @@ def login_form():
     if st.session_state.get("authenticated"):
         return True
 
-    st.markdown(
-        """
-        <div style="text-align: center; padding: 2rem 0;">
-            <h1 style="
-                background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-                -webkit-background-clip: text;
-                -webkit-text-fill-color: transparent;
-                font-size: 3rem;
-                font-weight: 800;
-                margin-bottom: 0.2rem;
-            ">Sales Brain</h1>
-            <p style="color: #8892b0; font-size: 1.1rem;">RevCortex Buying Process Mastery</p>
-        </div>
-        """,
-        unsafe_allow_html=True,
-    )
+    st.markdown(_LOGIN_HEADER_HTML, unsafe_allow_html=True)
 
     tab_login, tab_signup = st.tabs(["🔐 Login", "📝 Sign Up"])
 
@@ -95,12 +138,15 @@ def login_form():
             if submitted:
                 if not username or not password:
                     st.error("Please fill in all fields.")
-                elif authenticate(username, password):
-                    st.session_state["authenticated"] = True
-                    st.session_state["username"] = username
-                    st.rerun()
                 else:
-                    st.error("Invalid username or password.")
+                    with st.spinner("Verifying…"):
+                        authenticated = authenticate(username, password)
+                    if authenticated:
+                        st.session_state["authenticated"] = True
+                        st.session_state["username"] = username
+                        st.rerun()
+                    else:
+                        st.error("Invalid username or password.")
 
     with tab_signup:
         with st.form("signup_form"):
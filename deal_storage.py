@@ -1,8 +1,12 @@
 from __future__ import annotations
-import json
+import copy
 import os
 from datetime import datetime
 
+import streamlit as st
+
+import json_io
+
 DEALS_BASE_DIR = os.path.join(os.path.dirname(__file__), "data", "deals")
 
 
@@ -10,14 +14,31 @@ def _get_user_deals_dir(username: str) -> str:
     """Get the deals directory for a specific user."""
     return os.path.join(DEALS_BASE_DIR, username)
 
+
+def _get_history_path(deal_name: str, username: str) -> str:
+    """Get the append-only update history file (one JSON entry per line) for a deal."""
+    return os.path.join(_get_user_deals_dir(username), f"{deal_name}.history.jsonl")
+
+
+def _append_history(history_path: str, entries: list[dict]):
+    """Append entries to a history file in a single write.
+    If a previous append was interrupted mid-line, that line is terminated first
+    so only the torn entry is lost, not the one written after it."""
+    data = b"".join(json_io.dumps(entry) + b"\n" for entry in entries)
+    with open(history_path, "a+b") as f:
+        if f.seek(0, os.SEEK_END) > 0:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b"\n":
+                data = b"\n" + data
+        f.write(data)
+
 EMPTY_DEAL = {
     "deal_name": "",
     "created_at": "",
     "updated_at": "",
     "buying_process": {
         "buying_steps": []
-    },
-    "update_history": []
+    }
 }
 
 EMPTY_BUYING_STEP = {
@@ -41,56 +62,107 @@ EMPTY_BUYING_STEP = {
 }
 
 
+def is_valid_deal_name(deal_name: str) -> bool:
+    """Check that a deal name is safe to use as a filename (no path traversal)."""
+    return (
+        bool(deal_name.strip())
+        and not deal_name.startswith(".")
+        and not any(c in deal_name for c in ("/", "\\", "\0"))
+    )
+
+
+def deal_exists(deal_name: str, username: str) -> bool:
+    """Check whether a deal already exists for a specific user."""
+    return os.path.exists(os.path.join(_get_user_deals_dir(username), f"{deal_name}.json"))
+
+
+@st.cache_data(show_spinner=False, max_entries=64)
+def _list_deals_cached(user_dir: str, mtime_ns: int) -> list[str]:
+    """Scan a deals directory. Cached per directory mtime."""
+    with os.scandir(user_dir) as entries:
+        names = [e.name[:-len(".json")] for e in entries if e.name.endswith(".json")]
+    return sorted(names)
+
+
 def list_deals(username: str) -> list[str]:
     """List all deal names for a specific user."""
     user_dir = _get_user_deals_dir(username)
     os.makedirs(user_dir, exist_ok=True)
-    deals = []
-    for fname in sorted(os.listdir(user_dir)):
-        if fname.endswith(".json"):
-            deals.append(fname.replace(".json", ""))
-    return deals
+    return _list_deals_cached(user_dir, os.stat(user_dir).st_mtime_ns)
+
+
+@st.cache_data(show_spinner=False, max_entries=128)
+def _load_deal_cached(filepath: str, mtime_ns: int, size: int) -> dict:
+    """Read and parse a deal file. Cached per file mtime and size."""
+    with open(filepath, "rb") as f:
+        return json_io.loads(f.read())
 
 
 def load_deal(deal_name: str, username: str) -> dict | None:
     """Load a deal by name for a specific user. Returns None if not found."""
     filepath = os.path.join(_get_user_deals_dir(username), f"{deal_name}.json")
-    if not os.path.exists(filepath):
+    try:
+        stat = os.stat(filepath)
+    except FileNotFoundError:
         return None
-    with open(filepath, "r") as f:
-        return json.load(f)
+    return _load_deal_cached(filepath, stat.st_mtime_ns, stat.st_size)
 
 
 def save_deal(deal_name: str, deal_data: dict, username: str):
-    """Save deal data to a JSON file for a specific user."""
+    """Save deal data to a JSON file for a specific user.
+    Legacy inline update_history is moved to the deal's history file."""
     user_dir = _get_user_deals_dir(username)
     os.makedirs(user_dir, exist_ok=True)
+    legacy_history = deal_data.pop("update_history", None)
+    history_path = _get_history_path(deal_name, username)
+    # Skip when the history file exists: the entries were already moved by an
+    # earlier save whose deal-file write then failed
+    if legacy_history and not os.path.exists(history_path):
+        _append_history(history_path, legacy_history)
     deal_data["updated_at"] = datetime.now().isoformat()
     filepath = os.path.join(user_dir, f"{deal_name}.json")
-    with open(filepath, "w") as f:
-        json.dump(deal_data, f, indent=2)
+    json_io.write_atomic(filepath, json_io.dumps(deal_data, indent=True))
+
+
+def _new_deal() -> dict:
+    """Return a fresh empty deal that shares no nested objects with EMPTY_DEAL."""
+    return copy.deepcopy(EMPTY_DEAL)
 
 
 def create_deal(deal_name: str, username: str) -> dict:
     """Create a new empty deal for a specific user. Returns the deal data."""
-    deal = EMPTY_DEAL.copy()
+    deal = _new_deal()
     deal["deal_name"] = deal_name
     deal["created_at"] = datetime.now().isoformat()
     deal["updated_at"] = deal["created_at"]
-    deal["buying_process"] = {"buying_steps": []}
-    deal["update_history"] = []
     save_deal(deal_name, deal, username)
     return deal
 
 
-def add_update_to_history(deal_data: dict, raw_text: str, extracted_json: dict) -> dict:
-    """Add an update entry to the deal's history."""
-    deal_data["update_history"].append({
+def add_update_to_history(deal_name: str, username: str, raw_text: str, extracted_json: dict):
+    """Append an update entry to the deal's history file."""
+    os.makedirs(_get_user_deals_dir(username), exist_ok=True)
+    _append_history(_get_history_path(deal_name, username), [{
         "timestamp": datetime.now().isoformat(),
         "raw_text": raw_text,
         "extracted_data": extracted_json
-    })
-    return deal_data
+    }])
+
+
+def load_history(deal_name: str, username: str):
+    """Yield a deal's update history entries, oldest first, reading the file lazily."""
+    history_path = _get_history_path(deal_name, username)
+    if not os.path.exists(history_path):
+        return
+    with open(history_path, "rb") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                yield json_io.loads(line)
+            except ValueError:
+                # Skip a line torn by an interrupted append
+                continue
 
 
 def deal_to_text_summary(deal_data: dict) -> str:
@@ -111,29 +183,31 @@ def deal_to_text_summary(deal_data: dict) -> str:
         return "\n".join(lines)
 
     for i, step in enumerate(steps, 1):
+        products = step.get("product")
+        deps = step.get("step_dependency")
         lines.append(f"## Buying Step {i}: {step.get('name', 'Unnamed')}")
         lines.append(f"- Status: {step.get('status', 'N/A')}")
         lines.append(f"- Timeline: {step.get('timeline', 'N/A')}")
-        lines.append(f"- Product: {', '.join(step.get('product', [])) if step.get('product') else 'N/A'}")
+        lines.append(f"- Product: {', '.join(products) if products else 'N/A'}")
         lines.append(f"- Forecast Readiness: {step.get('forecast_readiness_dimension', 'N/A')}")
-        lines.append(f"- Dependencies: {', '.join(step.get('step_dependency', [])) if step.get('step_dependency') else 'None'}")
+        lines.append(f"- Dependencies: {', '.join(deps) if deps else 'None'}")
         lines.append(f"- Buyer Owner: {step.get('buyer_owner', 'N/A')}")
         lines.append(f"- Seller Owner: {step.get('seller_owner', 'N/A')}")
 
         actors = step.get("actors", {})
-        for sig in actors.get("signatories", []):
+        for sig in actors.get("signatories", ()):
             lines.append(f"  - **Signatory**: {sig.get('name', 'N/A')} | Timeline: {sig.get('timeline', 'N/A')} | Sign-off: {sig.get('sign_off_status', 'Pending')}")
-            for crit in sig.get("criteria", []):
+            for crit in sig.get("criteria", ()):
                 lines.append(f"    - Criterion: {crit.get('description', 'N/A')} [{crit.get('status', 'N/A')}]")
 
-        for ev in actors.get("evaluators", []):
+        for ev in actors.get("evaluators", ()):
             lines.append(f"  - **Evaluator**: {ev.get('name', 'N/A')} | Timeline: {ev.get('timeline', 'N/A')}")
-            for crit in ev.get("criteria", []):
+            for crit in ev.get("criteria", ()):
                 lines.append(f"    - Criterion: {crit.get('description', 'N/A')} [{crit.get('status', 'N/A')}]")
 
-        for inf in actors.get("influencers", []):
+        for inf in actors.get("influencers", ()):
             lines.append(f"  - **Influencer**: {inf.get('name', 'N/A')} | Timeline: {inf.get('timeline', 'N/A')}")
-            for crit in inf.get("criteria", []):
+            for crit in inf.get("criteria", ()):
                 lines.append(f"    - Criterion: {crit.get('description', 'N/A')} [{crit.get('status', 'N/A')}]")
 
         lines.append("")
@@ -7,30 +7,41 @@ from __future__ import annotations
 import base64
 import hashlib
 import os
-import urllib.request
-import urllib.parse
+
+import requests
+import streamlit as st
+
+import json_io
 
 
 CACHE_DIR = os.path.join(os.path.dirname(__file__), "data", "diagram_cache")
 
+# Characters that break Mermaid syntax, mapped to safe replacements
+_SANITIZE_TABLE = str.maketrans({
+    '"': "'",
+    "(": "[",
+    ")": "]",
+    "<": "",
+    ">": "",
+    "{": "[",
+    "}": "]",
+    "|": "/",
+    "#": "",
+})
+
+# Actors table layout, shared by iter_actor_rows and its callers
+ACTOR_COLUMNS = ("Step", "Role", "Name", "Title", "Sign-off", "Status", "Timeline", "Criteria")
+_ROLE_SIGNATORY = "🔑 Signatory"
+_ROLE_EVALUATOR = "🔍 Evaluator"
+_ROLE_INFLUENCER = "💬 Influencer"
+_NO_SIGN_OFF = "—"
+
 
 def _sanitize(text: str) -> str:
     """Sanitize text for Mermaid labels."""
     if not text:
         return "N/A"
-    # Remove characters that break Mermaid syntax
-    return (
-        text.replace('"', "'")
-        .replace("(", "[")
-        .replace(")", "]")
-        .replace("<", "")
-        .replace(">", "")
-        .replace("{", "[")
-        .replace("}", "]")
-        .replace("|", "/")
-        .replace("#", "")
-        .replace("&", "and")
-    )
+    return text.translate(_SANITIZE_TABLE).replace("&", "and")
 
 
 def _status_color(status: str) -> str:
@@ -48,44 +59,69 @@ def _status_color(status: str) -> str:
         return "default"
 
 
-def render_mermaid_to_image(mermaid_code: str) -> bytes | None:
-    """Render Mermaid code to a PNG image using mermaid.ink API.
-    Returns PNG bytes or None on failure."""
-    try:
-        os.makedirs(CACHE_DIR, exist_ok=True)
+@st.cache_resource(show_spinner=False)
+def _http_session() -> requests.Session:
+    """Shared HTTP session so repeated renders reuse the mermaid.ink connection."""
+    session = requests.Session()
+    session.headers["User-Agent"] = "SalesBrain/1.0"
+    return session
+
+
+@st.cache_data(show_spinner=False, max_entries=64)
+def _render_cached(mermaid_code: str) -> bytes:
+    """Render Mermaid code to PNG bytes, backed by the on-disk cache.
+    Raises on failure so errors are never cached."""
+    os.makedirs(CACHE_DIR, exist_ok=True)
 
-        # Check cache
-        code_hash = hashlib.md5(mermaid_code.encode()).hexdigest()
-        cache_path = os.path.join(CACHE_DIR, f"{code_hash}.png")
-        if os.path.exists(cache_path):
-            with open(cache_path, "rb") as f:
-                return f.read()
+    # Check disk cache
+    code_hash = hashlib.blake2b(mermaid_code.encode(), digest_size=16).hexdigest()
+    cache_path = os.path.join(CACHE_DIR, f"{code_hash}.png")
+    if os.path.exists(cache_path):
+        with open(cache_path, "rb") as f:
+            return f.read()
 
-        # Encode for mermaid.ink
-        encoded = base64.urlsafe_b64encode(mermaid_code.encode("utf-8")).decode("ascii")
-        url = f"https://mermaid.ink/img/{encoded}?type=png&bgColor=1a1a2e&theme=dark"
+    # Encode for mermaid.ink
+    encoded = base64.urlsafe_b64encode(mermaid_code.encode("utf-8")).decode("ascii")
+    url = f"https://mermaid.ink/img/{encoded}?type=png&bgColor=1a1a2e&theme=dark"
 
-        req = urllib.request.Request(url)
-        req.add_header("User-Agent", "SalesBrain/1.0")
-        with urllib.request.urlopen(req, timeout=15) as resp:
-            img_bytes = resp.read()
+    resp = _http_session().get(url, timeout=15)
+    resp.raise_for_status()
+    img_bytes = resp.content
 
-        # Cache it
-        with open(cache_path, "wb") as f:
-            f.write(img_bytes)
+    # Cache it
+    with open(cache_path, "wb") as f:
+        f.write(img_bytes)
 
-        return img_bytes
+    return img_bytes
+
+
+def render_mermaid_to_image(mermaid_code: str) -> bytes | None:
+    """Render Mermaid code to a PNG image using mermaid.ink API.
+    Returns PNG bytes or None on failure."""
+    try:
+        return _render_cached(mermaid_code)
     except Exception as e:
         print(f"Mermaid render error: {e}")
         return None
 
 
+def _buying_process_key(deal_data: dict) -> str:
+    """Content hash of a deal's buying process, used as a cache key."""
+    data = json_io.dumps(deal_data.get("buying_process", {}), sort_keys=True)
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
 def generate_mermaid(deal_data: dict) -> str:
     """Generate a Mermaid flowchart from deal data."""
     if not deal_data:
         return ""
+    return _generate_mermaid_cached(_buying_process_key(deal_data), deal_data)
 
-    bp = deal_data.get("buying_process", {})
+
+@st.cache_data(show_spinner=False, max_entries=64)
+def _generate_mermaid_cached(bp_key: str, _deal_data: dict) -> str:
+    """Build the flowchart. Cached on bp_key only; _deal_data is not hashed."""
+    bp = _deal_data.get("buying_process", {})
     steps = bp.get("buying_steps", [])
 
     if not steps:
@@ -101,21 +137,30 @@ def generate_mermaid(deal_data: dict) -> str:
     lines.append("    classDef default fill:#8b5cf6,stroke:#7c3aed,color:#fff,stroke-width:2px")
     lines.append("")
 
-    # Build nodes and edges
-    step_ids = {}
+    # Build nodes, collecting dependency edges for after the nodes
+    step_ids = {step.get("name", f"Step {i+1}"): f"step{i}" for i, step in enumerate(steps)}
+    pending_edges = []
+    has_deps = False
     for i, step in enumerate(steps):
         step_name = step.get("name", f"Step {i+1}")
         step_id = f"step{i}"
-        step_ids[step_name] = step_id
+
+        deps = step.get("step_dependency")
+        if deps:
+            has_deps = True
+            for dep_name in deps:
+                dep_id = step_ids.get(dep_name)
+                if dep_id:
+                    pending_edges.append(f"    {dep_id} --> {step_id}")
 
         status = step.get("status", "Not Started")
         timeline = step.get("timeline", "")
-        product = ", ".join(step.get("product", [])) if step.get("product") else ""
+        products = step.get("product")
+        product = ", ".join(products) if products else ""
         buyer = step.get("buyer_owner", "")
 
         # Build simple label (no HTML, use newlines)
-        label_parts = [_sanitize(step_name)]
-        label_parts.append(f"Status: {_sanitize(status)}")
+        label_parts = [_sanitize(step_name), f"Status: {_sanitize(status)}"]
         if timeline:
             label_parts.append(f"Timeline: {_sanitize(timeline)}")
         if product:
@@ -125,9 +170,9 @@ def generate_mermaid(deal_data: dict) -> str:
 
         # Add actors summary
         actors = step.get("actors", {})
-        sigs = actors.get("signatories", [])
-        evals_list = actors.get("evaluators", [])
-        infs = actors.get("influencers", [])
+        sigs = actors.get("signatories", ())
+        evals_list = actors.get("evaluators", ())
+        infs = actors.get("influencers", ())
 
         if sigs:
             sig_names = [_sanitize(s.get("name", "?")) for s in sigs]
@@ -147,18 +192,9 @@ def generate_mermaid(deal_data: dict) -> str:
         lines.append("")
 
     # Add dependency edges
-    for i, step in enumerate(steps):
-        step_name = step.get("name", f"Step {i+1}")
-        step_id = step_ids.get(step_name, f"step{i}")
-        deps = step.get("step_dependency", [])
-        if deps:
-            for dep_name in deps:
-                dep_id = step_ids.get(dep_name)
-                if dep_id:
-                    lines.append(f"    {dep_id} --> {step_id}")
+    lines.extend(pending_edges)
 
     # If no dependencies, show sequential flow
-    has_deps = any(step.get("step_dependency") for step in steps)
     if not has_deps and len(steps) > 1:
         for i in range(len(steps) - 1):
             lines.append(f"    step{i} --> step{i+1}")
@@ -166,9 +202,19 @@ def generate_mermaid(deal_data: dict) -> str:
     return "\n".join(lines)
 
 
-def generate_actors_table(deal_data: dict) -> list[dict]:
-    """Generate a flat table of all actors across all steps for display."""
-    rows = []
+def actor_rows(deal_data: dict) -> list[tuple]:
+    """All actor rows for a deal, in ACTOR_COLUMNS order. Cached per buying process."""
+    return _actor_rows_cached(_buying_process_key(deal_data), deal_data)
+
+
+@st.cache_data(show_spinner=False, max_entries=64)
+def _actor_rows_cached(bp_key: str, _deal_data: dict) -> list[tuple]:
+    """Materialize iter_actor_rows. Cached on bp_key only; _deal_data is not hashed."""
+    return list(iter_actor_rows(_deal_data))
+
+
+def iter_actor_rows(deal_data: dict):
+    """Yield one row per actor across all steps, in ACTOR_COLUMNS order."""
     bp = deal_data.get("buying_process", {})
     steps = bp.get("buying_steps", [])
 
@@ -176,40 +222,38 @@ def generate_actors_table(deal_data: dict) -> list[dict]:
         step_name = step.get("name", "Unknown")
         actors = step.get("actors", {})
 
-        for sig in actors.get("signatories", []):
-            rows.append({
-                "Step": step_name,
-                "Role": "🔑 Signatory",
-                "Name": sig.get("name", "N/A"),
-                "Title": sig.get("title", ""),
-                "Sign-off": sig.get("sign_off_status", "Pending"),
-                "Status": sig.get("status", "N/A"),
-                "Timeline": sig.get("timeline", ""),
-                "Criteria": len(sig.get("criteria", [])),
-            })
-
-        for ev in actors.get("evaluators", []):
-            rows.append({
-                "Step": step_name,
-                "Role": "🔍 Evaluator",
-                "Name": ev.get("name", "N/A"),
-                "Title": ev.get("title", ""),
-                "Sign-off": "—",
-                "Status": ev.get("status", "N/A"),
-                "Timeline": ev.get("timeline", ""),
-                "Criteria": len(ev.get("criteria", [])),
-            })
-
-        for inf in actors.get("influencers", []):
-            rows.append({
-                "Step": step_name,
-                "Role": "💬 Influencer",
-                "Name": inf.get("name", "N/A"),
-                "Title": inf.get("title", ""),
-                "Sign-off": "—",
-                "Status": inf.get("status", "N/A"),
-                "Timeline": inf.get("timeline", ""),
-                "Criteria": len(inf.get("criteria", [])),
-            })
-
-    return rows
+        for sig in actors.get("signatories", ()):
+            yield (
+                step_name,
+                _ROLE_SIGNATORY,
+                sig.get("name", "N/A"),
+                sig.get("title", ""),
+                sig.get("sign_off_status", "Pending"),
+                sig.get("status", "N/A"),
+                sig.get("timeline", ""),
+                len(sig.get("criteria", ())),
+            )
+
+        for ev in actors.get("evaluators", ()):
+            yield (
+                step_name,
+                _ROLE_EVALUATOR,
+                ev.get("name", "N/A"),
+                ev.get("title", ""),
+                _NO_SIGN_OFF,
+                ev.get("status", "N/A"),
+                ev.get("timeline", ""),
+                len(ev.get("criteria", ())),
+            )
+
+        for inf in actors.get("influencers", ()):
+            yield (
+                step_name,
+                _ROLE_INFLUENCER,
+                inf.get("name", "N/A"),
+                inf.get("title", ""),
+                _NO_SIGN_OFF,
+                inf.get("status", "N/A"),
+                inf.get("timeline", ""),
+                len(inf.get("criteria", ())),
+            )
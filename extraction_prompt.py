@@ -1,4 +1,10 @@
 from __future__ import annotations
+
+import functools
+
+import json_io
+from llm_providers import load_settings, settings_version
+
 DEFAULT_SYSTEM_PROMPT = """You are a Sales Deal Structuring AI. Your job is to extract and organize information from raw sales conversation text into a structured JSON format that represents a Buying Process.
 
 ## The Buying Process Structure
@@ -135,8 +141,7 @@ IMPORTANT: Return ONLY the JSON. No markdown, no explanation, no code fences. Ju
 def build_extraction_prompt(raw_text: str, existing_deal: dict | None = None) -> str:
     """Build the user prompt for extraction, handling both new and update cases."""
     if existing_deal and existing_deal.get("buying_process", {}).get("buying_steps"):
-        import json
-        existing_json = json.dumps(existing_deal["buying_process"], indent=2)
+        existing_json = json_io.dumps(existing_deal["buying_process"], indent=True).decode("utf-8")
         return f"""Here is the EXISTING deal structure:
 ```json
 {existing_json}
@@ -167,16 +172,20 @@ SALES UPDATE TEXT:
 Return the buying_process JSON."""
 
 
-def get_system_prompt() -> str:
-    """Get the system prompt. Returns custom prompt from settings if set, otherwise the default."""
-    from llm_providers import load_settings
-    settings = load_settings()
-    custom = settings.get("system_prompt", "").strip()
+@functools.lru_cache(maxsize=1)
+def _cached_system_prompt(version: tuple[int, int]) -> str:
+    """Resolve the system prompt for one version of the settings file."""
+    custom = load_settings().get("system_prompt", "").strip()
     if custom:
         return custom
     return DEFAULT_SYSTEM_PROMPT
 
 
+def get_system_prompt() -> str:
+    """Get the system prompt. Returns custom prompt from settings if set, otherwise the default."""
+    return _cached_system_prompt(settings_version())
+
+
 def build_messages(raw_text: str, existing_deal: dict | None = None) -> list[dict]:
     """Build the message list for LLM API calls."""
     return [
@@ -0,0 +1,51 @@
+"""
+JSON and file helpers. Uses orjson when it's installed and falls back to the stdlib.
+"""
+from __future__ import annotations
+
+import json
+import os
+import secrets
+
+try:
+    import orjson
+except ImportError:  # orjson is optional
+    orjson = None
+
+
+def loads(data: bytes | str):
+    """Parse JSON from bytes or str."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def dumps(obj, indent: bool = False, sort_keys: bool = False) -> bytes:
+    """Serialize to UTF-8 JSON bytes, optionally pretty-printed with 2 spaces."""
+    if orjson is not None:
+        option = (orjson.OPT_INDENT_2 if indent else 0) | (orjson.OPT_SORT_KEYS if sort_keys else 0)
+        return orjson.dumps(obj, option=option)
+    return json.dumps(
+        obj, indent=2 if indent else None, sort_keys=sort_keys, ensure_ascii=False
+    ).encode("utf-8")
+
+
+def write_atomic(path: str, data: bytes):
+    """Write bytes to path via a temp file and os.replace, so readers never see a partial file.
+    Keeps the existing file's permissions, or the umask default for a new file."""
+    try:
+        mode = os.stat(path).st_mode & 0o7777
+    except FileNotFoundError:
+        mode = None
+    tmp_path = os.path.join(os.path.dirname(path), f"tmp{secrets.token_hex(8)}.tmp")
+    # Not mkstemp, which always creates 0600; with 0o666 the kernel applies the umask
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        if mode is not None:
+            os.chmod(tmp_path, mode)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
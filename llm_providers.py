@@ -6,12 +6,45 @@ Falls back to st.secrets for Streamlit Cloud deployment.
 """
 from __future__ import annotations
 
+import copy
+import functools
+import importlib
 import json
 import os
 import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Iterator
+
+import streamlit as st
+
+import json_io
 
 SETTINGS_FILE = os.path.join(os.path.dirname(__file__), "data", "settings.json")
 
+# SDK module imported for each provider
+_SDK_MODULES = {
+    "gemini": "google.genai",
+    "together": "together",
+    "deepseek": "openai",
+}
+
+# Process-wide cache of parsed extraction results. Not st.cache_data, because
+# the streaming progress callback draws Streamlit elements, which cache_data
+# would record and fail to replay on a hit.
+_EXTRACT_CACHE_TTL = 3600
+_EXTRACT_CACHE_MAX_ENTRIES = 64
+_extract_cache: OrderedDict[tuple[str, str, str], tuple[float, dict]] = OrderedDict()
+_extract_cache_lock = threading.Lock()
+
+# on_progress is throttled: per-token deltas would otherwise mean one UI update each
+_PROGRESS_MIN_INTERVAL = 0.25
+_PROGRESS_MIN_CHARS = 2048
+
+_FENCE_RE = re.compile(r"```(?:json)?\s*\n?(.*?)\n?```", re.DOTALL)
+_DECODER = json.JSONDecoder()
+
 DEFAULT_SETTINGS = {
     "provider": "gemini",
     "gemini": {
@@ -25,41 +58,65 @@ DEFAULT_SETTINGS = {
     "deepseek": {
         "model": "deepseek-chat",
         "api_key": ""
-    }
+    },
+    "system_prompt": ""
 }
 
 
+def settings_version() -> tuple[int, int]:
+    """Return (mtime_ns, size) of the settings file, or (0, 0) if it doesn't exist.
+    Changes whenever save_settings() writes new content."""
+    try:
+        stat = os.stat(SETTINGS_FILE)
+    except FileNotFoundError:
+        return 0, 0
+    return stat.st_mtime_ns, stat.st_size
+
+
 def load_settings() -> dict:
     """Load settings from config file."""
-    settings = json.loads(json.dumps(DEFAULT_SETTINGS))  # deep copy
+    return copy.deepcopy(_load_settings_cached(settings_version()))
+
+
+@functools.lru_cache(maxsize=4)
+def _load_settings_cached(version: tuple[int, int]) -> dict:
+    """Read settings merged over defaults. Cached per settings file version."""
+    settings = copy.deepcopy(DEFAULT_SETTINGS)
     if os.path.exists(SETTINGS_FILE):
-        with open(SETTINGS_FILE, "r") as f:
-            saved = json.load(f)
+        with open(SETTINGS_FILE, "rb") as f:
+            saved = json_io.loads(f.read())
             settings["provider"] = saved.get("provider", settings["provider"])
             for provider in ("gemini", "together", "deepseek"):
                 if provider in saved:
                     settings[provider]["model"] = saved[provider].get("model", settings[provider]["model"])
                     settings[provider]["api_key"] = saved[provider].get("api_key", "")
+            settings["system_prompt"] = saved.get("system_prompt", "")
     return settings
 
 
 def save_settings(settings: dict):
     """Save settings (including API keys) to local config file.
-    This file is gitignored — never pushed to GitHub."""
+    This file is gitignored — never pushed to GitHub.
+    Skips the write when the file already holds the same content."""
     os.makedirs(os.path.dirname(SETTINGS_FILE), exist_ok=True)
-    with open(SETTINGS_FILE, "w") as f:
-        json.dump(settings, f, indent=2)
+    data = json_io.dumps(settings, indent=True)
+    if os.path.exists(SETTINGS_FILE):
+        with open(SETTINGS_FILE, "rb") as f:
+            if f.read() == data:
+                return
+    json_io.write_atomic(SETTINGS_FILE, data)
 
 
-def get_api_key(provider: str) -> str:
-    """Get API key for a provider. Checks settings file first, then st.secrets."""
-    settings = load_settings()
+def get_api_key(provider: str, settings: dict | None = None) -> str:
+    """Get API key for a provider. Checks settings file first, then st.secrets.
+    Pass already-loaded settings to avoid loading them again."""
+    if settings is None:
+        settings = load_settings()
     key = settings.get(provider, {}).get("api_key", "")
     if key:
         return key
     # Fallback to st.secrets for Streamlit Cloud
     try:
-        import streamlit as st
         secrets_key = f"{provider.upper()}_API_KEY"
         return st.secrets.get(secrets_key, "")
     except Exception:
@@ -69,30 +126,81 @@ def get_api_key(provider: str) -> str:
 def _parse_json_response(text: str) -> dict:
     """Extract JSON from LLM response, handling markdown fences."""
     text = text.strip()
-    fence_match = re.search(r"```(?:json)?\s*\n?(.*?)\n?```", text, re.DOTALL)
+    # Fast path: well-behaved responses are already a bare JSON object
+    if text.startswith("{"):
+        try:
+            return json_io.loads(text)
+        except ValueError:
+            pass
+    fence_match = _FENCE_RE.search(text)
     if fence_match:
         text = fence_match.group(1).strip()
     start = text.find("{")
     if start == -1:
         raise ValueError(f"No JSON object found in response: {text[:200]}")
-    depth = 0
-    end = start
-    for i in range(start, len(text)):
-        if text[i] == "{":
-            depth += 1
-        elif text[i] == "}":
-            depth -= 1
-            if depth == 0:
-                end = i + 1
-                break
-    return json.loads(text[start:end])
+    # raw_decode stops at the end of the first complete object (string-aware)
+    obj, _ = _DECODER.raw_decode(text, start)
+    return obj
+
+
+def _json_response_format(json_mode: bool) -> dict:
+    """Extra chat.completions kwargs that ask an OpenAI-style API for a bare JSON object."""
+    return {"response_format": {"type": "json_object"}} if json_mode else {}
+
+
+def _iter_chat_deltas(stream) -> Iterator[str]:
+    """Yield the text deltas from an OpenAI-style streaming chat completion."""
+    for chunk in stream:
+        if chunk.choices:
+            delta = chunk.choices[0].delta.content
+            if delta:
+                yield delta
+
+
+@st.cache_resource(show_spinner=False)
+def _load_sdk(provider: str):
+    """Import a provider's SDK on first use, so only the selected one is ever loaded."""
+    return importlib.import_module(_SDK_MODULES[provider])
+
+
+@st.cache_resource(show_spinner=False)
+def _gemini_client(api_key: str):
+    """Gemini client, cached per API key so its connection pool is reused."""
+    return _load_sdk("gemini").Client(api_key=api_key)
+
 
+@st.cache_resource(show_spinner=False)
+def _together_client(api_key: str):
+    """Together client, cached per API key so its connection pool is reused."""
+    return _load_sdk("together").Together(api_key=api_key)
 
-def _call_gemini(messages: list[dict], settings: dict, api_key: str) -> str:
-    """Call Google Gemini API."""
-    from google import genai
 
-    client = genai.Client(api_key=api_key)
+@st.cache_resource(show_spinner=False)
+def _shared_http_client():
+    """Keep-alive connection pool shared by OpenAI-compatible clients, so
+    rotating the API key doesn't mean a new TLS handshake."""
+    import httpx  # installed with the openai SDK
+
+    return httpx.Client(
+        follow_redirects=True,
+        limits=httpx.Limits(max_keepalive_connections=8),
+    )
+
+
+@st.cache_resource(show_spinner=False)
+def _deepseek_client(api_key: str):
+    """DeepSeek (OpenAI-compatible) client, cached per API key so its connection pool is reused."""
+    return _load_sdk("deepseek").OpenAI(
+        api_key=api_key,
+        base_url="https://api.deepseek.com",
+        http_client=_shared_http_client(),
+    )
+
+
+def _stream_gemini(messages: list[dict], model: str, api_key: str, json_mode: bool = True) -> Iterator[str]:
+    """Stream a completion from Google Gemini API."""
+    genai = _load_sdk("gemini")
+    client = _gemini_client(api_key)
 
     system_instruction = None
     contents = []
@@ -102,53 +210,96 @@ def _call_gemini(messages: list[dict], settings: dict, api_key: str) -> str:
         else:
             contents.append(msg["content"])
 
-    response = client.models.generate_content(
-        model=settings["gemini"]["model"],
+    stream = client.models.generate_content_stream(
+        model=model,
         contents=contents,
         config=genai.types.GenerateContentConfig(
             system_instruction=system_instruction,
             temperature=0.1,
+            response_mime_type="application/json" if json_mode else None,
         ),
     )
-    return response.text
+    for chunk in stream:
+        if chunk.text:
+            yield chunk.text
 
 
-def _call_together(messages: list[dict], settings: dict, api_key: str) -> str:
-    """Call Together AI API."""
-    from together import Together
-
-    client = Together(api_key=api_key)
-    response = client.chat.completions.create(
-        model=settings["together"]["model"],
+def _stream_together(messages: list[dict], model: str, api_key: str, json_mode: bool = True) -> Iterator[str]:
+    """Stream a completion from Together AI API."""
+    client = _together_client(api_key)
+    stream = client.chat.completions.create(
+        model=model,
         messages=messages,
         temperature=0.1,
         max_tokens=4096,
+        stream=True,
+        **_json_response_format(json_mode),
     )
-    return response.choices[0].message.content
-
+    yield from _iter_chat_deltas(stream)
 
-def _call_deepseek(messages: list[dict], settings: dict, api_key: str) -> str:
-    """Call DeepSeek API via OpenAI-compatible endpoint."""
-    from openai import OpenAI
 
-    client = OpenAI(
-        api_key=api_key,
-        base_url="https://api.deepseek.com",
-    )
-    response = client.chat.completions.create(
-        model=settings["deepseek"]["model"],
+def _stream_deepseek(messages: list[dict], model: str, api_key: str, json_mode: bool = True) -> Iterator[str]:
+    """Stream a completion from DeepSeek API via OpenAI-compatible endpoint."""
+    client = _deepseek_client(api_key)
+    stream = client.chat.completions.create(
+        model=model,
         messages=messages,
         temperature=0.1,
         max_tokens=4096,
+        stream=True,
+        **_json_response_format(json_mode),
     )
-    return response.choices[0].message.content
+    yield from _iter_chat_deltas(stream)
 
 
-def extract_deal_info(messages: list[dict]) -> dict:
-    """Call the selected LLM provider and return parsed JSON."""
-    settings = load_settings()
+_PROVIDER_STREAMS = {
+    "gemini": _stream_gemini,
+    "together": _stream_together,
+    "deepseek": _stream_deepseek,
+}
+
+
+def _call_provider(
+    provider: str,
+    messages: list[dict],
+    model: str,
+    api_key: str,
+    json_mode: bool = True,
+    on_progress: Callable[[int], None] | None = None,
+) -> str:
+    """Stream a completion and return the full text.
+    on_progress, if given, is called with the number of characters received so far,
+    at most every _PROGRESS_MIN_INTERVAL seconds or _PROGRESS_MIN_CHARS characters,
+    and once more when the stream ends."""
+    chunks = []
+    received = 0
+    reported = 0
+    last_report = time.monotonic()
+    for chunk in _PROVIDER_STREAMS[provider](messages, model, api_key, json_mode):
+        chunks.append(chunk)
+        received += len(chunk)
+        if on_progress is not None:
+            now = time.monotonic()
+            if now - last_report >= _PROGRESS_MIN_INTERVAL or received - reported >= _PROGRESS_MIN_CHARS:
+                on_progress(received)
+                reported, last_report = received, now
+    if on_progress is not None and received != reported:
+        on_progress(received)
+    return "".join(chunks)
+
+
+def extract_deal_info(
+    messages: list[dict],
+    settings: dict | None = None,
+    on_progress: Callable[[int], None] | None = None,
+) -> dict:
+    """Call the selected LLM provider and return parsed JSON.
+    Uses the given settings if the caller already loaded them.
+    on_progress is called with the number of characters received while the response streams."""
+    if settings is None:
+        settings = load_settings()
     provider = settings.get("provider", "gemini")
-    api_key = get_api_key(provider)
+    api_key = get_api_key(provider, settings)
 
     if not api_key:
         raise ValueError(
@@ -156,24 +307,54 @@ def extract_deal_info(messages: list[dict]) -> dict:
             f"Please ask your admin to configure it in the Settings page."
         )
 
-    call_fn = {
-        "gemini": _call_gemini,
-        "together": _call_together,
-        "deepseek": _call_deepseek,
-    }
-
-    if provider not in call_fn:
+    if provider not in _PROVIDER_STREAMS:
         raise ValueError(f"Unknown provider: {provider}")
 
-    raw_response = call_fn[provider](messages, settings, api_key)
-    return _parse_json_response(raw_response)
-
-
-def test_connection() -> tuple[bool, str]:
-    """Test the current LLM provider connection."""
+    model = settings[provider]["model"]
+    # Cached on provider, model and messages; the API key is not part of the key
+    cache_key = (provider, model, json.dumps(messages, sort_keys=True))
+    result = _extract_cache_get(cache_key)
+    if result is None:
+        raw_response = _call_provider(provider, messages, model, api_key, on_progress=on_progress)
+        result = _parse_json_response(raw_response)
+        _extract_cache_put(cache_key, result)
+    return copy.deepcopy(result)
+
+
+def _extract_cache_get(key: tuple[str, str, str]) -> dict | None:
+    """Return a cached extraction result, or None if missing or expired."""
+    with _extract_cache_lock:
+        entry = _extract_cache.get(key)
+        if entry is None:
+            return None
+        stored_at, result = entry
+        if time.monotonic() - stored_at > _EXTRACT_CACHE_TTL:
+            del _extract_cache[key]
+            return None
+        _extract_cache.move_to_end(key)
+        return result
+
+
+def _extract_cache_put(key: tuple[str, str, str], result: dict):
+    """Store an extraction result, evicting the least recently used entries."""
+    with _extract_cache_lock:
+        _extract_cache[key] = (time.monotonic(), copy.deepcopy(result))
+        _extract_cache.move_to_end(key)
+        while len(_extract_cache) > _EXTRACT_CACHE_MAX_ENTRIES:
+            _extract_cache.popitem(last=False)
+
+
+def test_connection(provider: str | None = None, api_key: str | None = None,
+                    model: str | None = None) -> tuple[bool, str]:
+    """Test an LLM provider connection. Anything not passed in is taken from
+    the saved settings, so no arguments tests the active provider."""
     settings = load_settings()
-    provider = settings.get("provider", "gemini")
-    api_key = get_api_key(provider)
+    if provider is None:
+        provider = settings.get("provider", "gemini")
+    if api_key is None:
+        api_key = get_api_key(provider, settings)
+    if model is None:
+        model = settings.get(provider, {}).get("model", "N/A")
 
     if not api_key:
         return False, f"No API key set for {provider}."
@@ -183,13 +364,7 @@ def test_connection() -> tuple[bool, str]:
             {"role": "system", "content": "You are a helpful assistant."},
             {"role": "user", "content": "Reply with exactly: CONNECTION_OK"},
         ]
-        call_fn = {
-            "gemini": _call_gemini,
-            "together": _call_together,
-            "deepseek": _call_deepseek,
-        }
-        model = settings.get(provider, {}).get("model", "N/A")
-        response = call_fn[provider](messages, settings, api_key)
+        response = _call_provider(provider, messages, model, api_key, json_mode=False)
         if "CONNECTION_OK" in response:
             return True, f"✅ Connected to {provider} ({model})"
         else:
@@ -1,37 +1,13 @@
 import streamlit as st
 import json
-from auth import is_admin
-from deal_storage import load_deal, save_deal, add_update_to_history, deal_to_text_summary
+import pandas as pd
+from auth import is_admin, logout
+from deal_storage import load_deal, save_deal, add_update_to_history, load_history, deal_to_text_summary
 from extraction_prompt import build_messages
-from llm_providers import extract_deal_info, load_settings, get_api_key
-from diagram import generate_mermaid, generate_actors_table, render_mermaid_to_image
+from llm_providers import extract_deal_info, load_settings, get_api_key, settings_version
+from diagram import ACTOR_COLUMNS, actor_rows, generate_mermaid, render_mermaid_to_image
 
-st.set_page_config(
-    page_title="Deal Workspace | Sales Brain",
-    page_icon="📋",
-    layout="wide",
-)
-
-# ─── Auth check ───
-if not st.session_state.get("authenticated"):
-    st.warning("Please log in first.")
-    st.switch_page("app.py")
-    st.stop()
-
-# ─── Active deal check ───
-active_deal = st.session_state.get("active_deal")
-if not active_deal:
-    st.warning("No deal selected. Please select or create a deal.")
-    st.switch_page("app.py")
-    st.stop()
-
-deal_data = load_deal(active_deal, st.session_state["username"])
-if not deal_data:
-    st.error(f"Deal '{active_deal}' not found.")
-    st.stop()
-
-# ─── Custom CSS ───
-st.markdown("""
+_CSS = """
 <style>
     /* Hide Streamlit's auto-generated sidebar page links */
     [data-testid="stSidebarNav"] {
@@ -58,7 +34,34 @@ st.markdown("""
         padding: 1rem;
     }
 </style>
-""", unsafe_allow_html=True)
+"""
+
+st.set_page_config(
+    page_title="Deal Workspace | Sales Brain",
+    page_icon="📋",
+    layout="wide",
+)
+
+# ─── Auth check ───
+if not st.session_state.get("authenticated"):
+    st.warning("Please log in first.")
+    st.switch_page("app.py")
+    st.stop()
+
+# ─── Active deal check ───
+active_deal = st.session_state.get("active_deal")
+if not active_deal:
+    st.warning("No deal selected. Please select or create a deal.")
+    st.switch_page("app.py")
+    st.stop()
+
+deal_data = load_deal(active_deal, st.session_state["username"])
+if not deal_data:
+    st.error(f"Deal '{active_deal}' not found.")
+    st.stop()
+
+# ─── Custom CSS ───
+st.markdown(_CSS, unsafe_allow_html=True)
 
 # ─── Sidebar ───
 with st.sidebar:
@@ -66,11 +69,17 @@ with st.sidebar:
     st.markdown(f"Logged in as **{st.session_state.get('username', 'User')}**")
     st.divider()
 
-    settings = load_settings()
-    provider = settings.get("provider", "gemini")
-    provider_config = settings.get(provider, {})
-    model = provider_config.get("model", "N/A")
-    has_key = bool(get_api_key(provider))
+    # Provider summary is only recomputed when the settings file changes
+    version = settings_version()
+    llm_sidebar = st.session_state.get("llm_sidebar")
+    if llm_sidebar is None or llm_sidebar[0] != version:
+        settings = load_settings()
+        provider = settings.get("provider", "gemini")
+        model = settings.get(provider, {}).get("model", "N/A")
+        has_key = bool(get_api_key(provider, settings))
+        llm_sidebar = (version, provider, model, has_key)
+        st.session_state["llm_sidebar"] = llm_sidebar
+    _, provider, model, has_key = llm_sidebar
 
     # Only show LLM details to admin
     if is_admin():
@@ -87,8 +96,7 @@ with st.sidebar:
     if st.button("← Back to Dashboard", use_container_width=True):
         st.switch_page("app.py")
     if st.button("🚪 Logout", use_container_width=True):
-        for key in list(st.session_state.keys()):
-            del st.session_state[key]
+        logout()
         st.rerun()
 
 # ─── Header ───
@@ -96,17 +104,35 @@ st.markdown(f'<div class="workspace-header">📋 {active_deal}</div>', unsafe_al
 st.caption(f"Created: {deal_data.get('created_at', 'N/A')} | Last Updated: {deal_data.get('updated_at', 'N/A')}")
 
 # ─── Tabs ───
-tab_input, tab_diagram, tab_data, tab_history = st.tabs([
+# A radio instead of st.tabs, so only the selected tab's body runs on each rerun
+TAB_INPUT, TAB_DIAGRAM, TAB_DATA, TAB_HISTORY = (
     "💬 Update Deal", "📊 Buying Process Diagram", "📄 Structured Data", "📜 History"
-])
+)
+active_tab = st.radio(
+    "Section",
+    [TAB_INPUT, TAB_DIAGRAM, TAB_DATA, TAB_HISTORY],
+    horizontal=True,
+    label_visibility="collapsed",
+    key="workspace_tab",
+)
 
 # ─── Tab 1: Input ───
-with tab_input:
+if active_tab == TAB_INPUT:
     st.markdown("### Paste deal update below")
     st.markdown("*Meeting notes, email threads, call summaries — any raw text about this deal.*")
 
+    # Widget state is dropped while another section is shown, so the draft is
+    # mirrored into a plain session key (per deal) and used to re-seed the box
+    drafts = st.session_state.setdefault("_draft", {})
+
+    def _save_draft():
+        drafts[active_deal] = st.session_state["deal_update_input"]
+
     raw_text = st.text_area(
         "Deal Update",
+        value=drafts.get(active_deal, ""),
+        key="deal_update_input",
+        on_change=_save_draft,
         height=250,
         placeholder=(
             "Had a great call with Sarah (Head of IT) today. "
@@ -131,9 +157,13 @@ with tab_input:
         else:
             spinner_msg = f"🤖 Extracting with {provider.title()} ({model})..." if is_admin() else "🤖 Analyzing deal update..."
             with st.spinner(spinner_msg):
+                progress = st.empty()
                 try:
                     messages = build_messages(raw_text, deal_data)
-                    result = extract_deal_info(messages)
+                    result = extract_deal_info(
+                        messages,
+                        on_progress=lambda n: progress.caption(f"Received {n:,} characters..."),
+                    )
 
                     # Update deal data
                     if "buying_process" in result:
@@ -141,9 +171,12 @@ with tab_input:
                     else:
                         deal_data["buying_process"] = result
 
-                    deal_data = add_update_to_history(deal_data, raw_text, result)
                     save_deal(active_deal, deal_data, st.session_state["username"])
+                    add_update_to_history(active_deal, st.session_state["username"], raw_text, result)
                     st.session_state["last_extraction"] = result
+                    # Submitted notes must not come back pre-filled and be applied twice
+                    drafts.pop(active_deal, None)
+                    st.session_state.pop("deal_update_input", None)
 
                     st.success("✅ Deal updated successfully!")
                     st.balloons()
@@ -155,6 +188,8 @@ with tab_input:
                     st.error(f"Failed to parse LLM response as JSON: {str(e)}")
                 except Exception as e:
                     st.error(f"Extraction failed: {str(e)}")
+                finally:
+                    progress.empty()
 
     # Show current summary below input
     steps = deal_data.get("buying_process", {}).get("buying_steps", [])
@@ -173,7 +208,7 @@ with tab_input:
                     st.caption(f"Signatory: {sigs[0].get('name', 'TBD')}")
 
 # ─── Tab 2: Diagram ───
-with tab_diagram:
+elif active_tab == TAB_DIAGRAM:
     steps = deal_data.get("buying_process", {}).get("buying_steps", [])
     if not steps:
         st.info("No buying steps yet. Submit a deal update to generate the diagram.")
@@ -205,10 +240,10 @@ with tab_diagram:
 
         # Actors table
         st.markdown("### 👥 Actors Overview")
-        actors_data = generate_actors_table(deal_data)
-        if actors_data:
+        actors_df = pd.DataFrame.from_records(actor_rows(deal_data), columns=ACTOR_COLUMNS)
+        if not actors_df.empty:
             st.dataframe(
-                actors_data,
+                actors_df,
                 use_container_width=True,
                 hide_index=True,
             )
@@ -216,7 +251,7 @@ with tab_diagram:
             st.info("No actors identified yet.")
 
 # ─── Tab 3: Structured Data ───
-with tab_data:
+elif active_tab == TAB_DATA:
     steps = deal_data.get("buying_process", {}).get("buying_steps", [])
     if not steps:
         st.info("No structured data yet. Submit a deal update first.")
@@ -232,8 +267,9 @@ with tab_data:
             st.json(deal_data.get("buying_process", {}))
 
 # ─── Tab 4: History ───
-with tab_history:
-    history = deal_data.get("update_history", [])
+elif active_tab == TAB_HISTORY:
+    # Deals not saved since history moved out of the deal file still carry it inline
+    history = deal_data.get("update_history", []) + list(load_history(active_deal, st.session_state["username"]))
     if not history:
         st.info("No update history yet.")
     else:
@@ -1,28 +1,12 @@
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+
 import streamlit as st
 from llm_providers import load_settings, save_settings, test_connection, get_api_key
-from auth import is_admin
+from auth import is_admin, logout
 from extraction_prompt import DEFAULT_SYSTEM_PROMPT
 
-st.set_page_config(
-    page_title="Settings | Sales Brain",
-    page_icon="⚙️",
-    layout="wide",
-)
-
-# ─── Auth check ───
-if not st.session_state.get("authenticated"):
-    st.warning("Please log in first.")
-    st.switch_page("app.py")
-    st.stop()
-
-# ─── Admin check ───
-if not is_admin():
-    st.error("⛔ Settings are only accessible to the admin.")
-    st.switch_page("app.py")
-    st.stop()
-
-# ─── Custom CSS ───
-st.markdown("""
+_CSS = """
 <style>
     /* Hide Streamlit's auto-generated sidebar page links */
     [data-testid="stSidebarNav"] {
@@ -36,142 +20,228 @@ st.markdown("""
         font-weight: 700;
     }
 </style>
-""", unsafe_allow_html=True)
-
-# ─── Sidebar ───
-with st.sidebar:
-    st.markdown("### ⚙️ Settings")
-    st.markdown(f"Logged in as **{st.session_state.get('username', 'User')}**")
-    st.caption("🔑 Admin")
-    st.divider()
-    if st.button("← Back to Dashboard", use_container_width=True):
-        st.switch_page("app.py")
-    if st.button("🚪 Logout", use_container_width=True):
-        for key in list(st.session_state.keys()):
-            del st.session_state[key]
-        st.rerun()
-
-# ─── Header ───
-st.markdown('<div class="settings-header">⚙️ Settings</div>', unsafe_allow_html=True)
-st.caption("Configure your LLM provider, API keys, and model preferences")
-
-st.info("🔒 **API keys are stored locally** in `data/settings.json` (gitignored — never pushed to GitHub). All users share the same keys set by admin.", icon="🔐")
+"""
 
-settings = load_settings()
-
-# ─── Provider Selection ───
-st.markdown("### 🤖 LLM Provider")
+_NOTES_MD = """
+| Provider | Best For | Notes |
+|----------|----------|-------|
+| **Gemini** | High-quality extraction, fast | Free tier at aistudio.google.com |
+| **Together AI** | Open-source models, Qwen 3 | Good balance of quality and cost |
+| **DeepSeek** | Cost-effective, strong reasoning | OpenAI-compatible API |
+"""
 
-provider_options = {
+_PROVIDERS = ("gemini", "together", "deepseek")
+_PROVIDER_LABELS = {
     "gemini": "🔷 Google Gemini",
     "together": "🟣 Together AI (Qwen)",
     "deepseek": "🔵 DeepSeek",
 }
+_PROVIDER_INDEX = {p: i for i, p in enumerate(_PROVIDERS)}
 
-current_provider = settings.get("provider", "gemini")
-selected_provider = st.radio(
-    "Select your LLM provider",
-    options=list(provider_options.keys()),
-    format_func=lambda x: provider_options[x],
-    index=list(provider_options.keys()).index(current_provider),
-    horizontal=True,
-)
 
-st.markdown("---")
+class _ConnectionFailed(Exception):
+    pass
 
-# ─── Provider Configs ───
-st.markdown("### 🔑 API Configuration")
 
-col1, col2, col3 = st.columns(3)
+@st.cache_data(ttl=60, show_spinner=False)
+def _cached_test(provider: str, key_hash: str, model: str, _api_key: str) -> str:
+    """Successful checks are reused for a minute per (provider, key, model).
+    The key itself is excluded from the cache key; only its hash is stored.
+    Failures raise, so they are never cached and the next click retries."""
+    success, msg = test_connection(provider, _api_key, model)
+    if not success:
+        raise _ConnectionFailed(msg)
+    return msg
 
-with col1:
-    st.markdown("#### 🔷 Gemini")
-    if selected_provider == "gemini":
-        st.success("✅ Active provider")
 
-    gemini_key = st.text_input(
-        "Gemini API Key",
-        value=settings.get("gemini", {}).get("api_key", ""),
-        type="password",
-        key="gemini_key_input",
-        help="Get your key from https://aistudio.google.com/apikey",
-    )
-    gemini_model = st.text_input(
-        "Gemini Model",
-        value=settings.get("gemini", {}).get("model", "gemini-2.5-flash"),
-        key="gemini_model",
-        help="e.g. gemini-2.5-flash, gemini-2.5-pro",
-    )
+def _run_test(provider: str, api_key: str, model: str) -> tuple[bool, str]:
+    """Test one provider, serving a recent success from cache."""
+    # An empty form key falls back to st.secrets only, not to the saved file
+    api_key = api_key or get_api_key(provider, {})
+    key_hash = hashlib.sha256(api_key.encode()).hexdigest()[:16]
+    try:
+        return True, _cached_test(provider, key_hash, model, api_key)
+    except _ConnectionFailed as e:
+        return False, str(e)
 
-with col2:
-    st.markdown("#### 🟣 Together AI")
-    if selected_provider == "together":
-        st.success("✅ Active provider")
-
-    together_key = st.text_input(
-        "Together API Key",
-        value=settings.get("together", {}).get("api_key", ""),
-        type="password",
-        key="together_key_input",
-        help="Get your key from https://api.together.xyz/settings/api-keys",
-    )
-    together_model = st.text_input(
-        "Together Model",
-        value=settings.get("together", {}).get("model", "Qwen/Qwen3-Next-80B-A3B-Instruct"),
-        key="together_model",
-        help="e.g. Qwen/Qwen3-Next-80B-A3B-Instruct",
-    )
 
-with col3:
-    st.markdown("#### 🔵 DeepSeek")
-    if selected_provider == "deepseek":
-        st.success("✅ Active provider")
-
-    deepseek_key = st.text_input(
-        "DeepSeek API Key",
-        value=settings.get("deepseek", {}).get("api_key", ""),
-        type="password",
-        key="deepseek_key_input",
-        help="Get your key from https://platform.deepseek.com/api_keys",
-    )
-    deepseek_model = st.text_input(
-        "DeepSeek Model",
-        value=settings.get("deepseek", {}).get("model", "deepseek-chat"),
-        key="deepseek_model",
-        help="e.g. deepseek-chat, deepseek-reasoner",
-    )
+def _test_all() -> dict[str, tuple[bool, str]]:
+    """Test every provider with the values currently in the form.
+    The checks are network-bound, so they run concurrently."""
+    args = [
+        (p, st.session_state[f"{p}_key_input"], st.session_state[f"{p}_model"])
+        for p in _PROVIDERS
+    ]
+    with ThreadPoolExecutor(max_workers=len(_PROVIDERS)) as pool:
+        return dict(zip(_PROVIDERS, pool.map(lambda a: _run_test(*a), args)))
 
-# ─── System Prompt ───
-st.markdown("---")
-st.markdown("### 📝 System Prompt")
-st.caption("This prompt instructs the AI how to extract and structure deal information. Edit carefully — it controls the quality of deal extraction.")
 
-current_prompt = settings.get("system_prompt", "").strip() or DEFAULT_SYSTEM_PROMPT
-
-prompt_col, reset_col = st.columns([4, 1])
-with reset_col:
-    st.markdown("<br>", unsafe_allow_html=True)
-    reset_prompt = st.button("🔄 Reset to Default", use_container_width=True)
+st.set_page_config(
+    page_title="Settings | Sales Brain",
+    page_icon="⚙️",
+    layout="wide",
+)
 
-if reset_prompt:
-    current_prompt = DEFAULT_SYSTEM_PROMPT
-    st.toast("Prompt reset to default. Click Save to apply.")
+# ─── Auth check ───
+if not st.session_state.get("authenticated"):
+    st.warning("Please log in first.")
+    st.switch_page("app.py")
+    st.stop()
 
-edited_prompt = st.text_area(
-    "System Prompt",
-    value=current_prompt,
-    height=400,
-    label_visibility="collapsed",
-    key="system_prompt_editor",
-)
+# ─── Admin check ───
+if not is_admin():
+    st.error("⛔ Settings are only accessible to the admin.")
+    st.switch_page("app.py")
+    st.stop()
 
-st.markdown("---")
 
-# ─── Save & Test ───
-save_col, test_col = st.columns(2)
+def _render_settings():
+    """Render the page. Only called once both guards have passed."""
+    # ─── Custom CSS ───
+    st.markdown(_CSS, unsafe_allow_html=True)
+
+    # ─── Sidebar ───
+    with st.sidebar:
+        st.markdown("### ⚙️ Settings")
+        st.markdown(f"Logged in as **{st.session_state.get('username', 'User')}**")
+        st.caption("🔑 Admin")
+        st.divider()
+        if st.button("← Back to Dashboard", use_container_width=True):
+            st.switch_page("app.py")
+        if st.button("🚪 Logout", use_container_width=True):
+            logout()
+            st.rerun()
+
+    # ─── Header ───
+    st.markdown('<div class="settings-header">⚙️ Settings</div>', unsafe_allow_html=True)
+    st.caption("Configure your LLM provider, API keys, and model preferences")
+
+    st.info("🔒 **API keys are stored locally** in `data/settings.json` (gitignored — never pushed to GitHub). All users share the same keys set by admin.", icon="🔐")
+
+    settings = load_settings()
+    # Stored keys only — st.secrets fallbacks are never copied into the inputs (and so never saved to disk)
+    keys = {p: settings.get(p, {}).get("api_key", "") for p in _PROVIDERS}
+
+    # Seed the form inputs once; afterwards the widgets own their values via session_state
+    for provider, default_model in (
+        ("gemini", "gemini-2.5-flash"),
+        ("together", "Qwen/Qwen3-Next-80B-A3B-Instruct"),
+        ("deepseek", "deepseek-chat"),
+    ):
+        st.session_state.setdefault(f"{provider}_key_input", keys[provider])
+        st.session_state.setdefault(f"{provider}_model", settings.get(provider, {}).get("model", default_model))
+    st.session_state.setdefault(
+        "system_prompt_editor", settings.get("system_prompt", "").strip() or DEFAULT_SYSTEM_PROMPT
+    )
 
-with save_col:
-    if st.button("💾 Save Settings", use_container_width=True, type="primary"):
+    # ─── Provider form ───
+    # Edits are batched in one form; the page only reruns when a form button is pressed
+    with st.form("provider_config"):
+        # ─── Provider Selection ───
+        st.markdown("### 🤖 LLM Provider")
+
+        current_provider = settings.get("provider", "gemini")
+        selected_provider = st.radio(
+            "Select your LLM provider",
+            options=_PROVIDERS,
+            format_func=_PROVIDER_LABELS.__getitem__,
+            index=_PROVIDER_INDEX.get(current_provider, 0),
+            horizontal=True,
+        )
+
+        st.markdown("---")
+
+        # ─── Provider Configs ───
+        st.markdown("### 🔑 API Configuration")
+
+        col1, col2, col3 = st.columns(3)
+
+        with col1:
+            st.markdown("#### 🔷 Gemini")
+            if selected_provider == "gemini":
+                st.success("✅ Active provider")
+
+            gemini_key = st.text_input(
+                "Gemini API Key",
+                type="password",
+                key="gemini_key_input",
+                help="Get your key from https://aistudio.google.com/apikey",
+            )
+            gemini_model = st.text_input(
+                "Gemini Model",
+                key="gemini_model",
+                help="e.g. gemini-2.5-flash, gemini-2.5-pro",
+            )
+
+        with col2:
+            st.markdown("#### 🟣 Together AI")
+            if selected_provider == "together":
+                st.success("✅ Active provider")
+
+            together_key = st.text_input(
+                "Together API Key",
+                type="password",
+                key="together_key_input",
+                help="Get your key from https://api.together.xyz/settings/api-keys",
+            )
+            together_model = st.text_input(
+                "Together Model",
+                key="together_model",
+                help="e.g. Qwen/Qwen3-Next-80B-A3B-Instruct",
+            )
+
+        with col3:
+            st.markdown("#### 🔵 DeepSeek")
+            if selected_provider == "deepseek":
+                st.success("✅ Active provider")
+
+            deepseek_key = st.text_input(
+                "DeepSeek API Key",
+                type="password",
+                key="deepseek_key_input",
+                help="Get your key from https://platform.deepseek.com/api_keys",
+            )
+            deepseek_model = st.text_input(
+                "DeepSeek Model",
+                key="deepseek_model",
+                help="e.g. deepseek-chat, deepseek-reasoner",
+            )
+
+        # ─── System Prompt ───
+        st.markdown("---")
+        st.markdown("### 📝 System Prompt")
+        st.caption("This prompt instructs the AI how to extract and structure deal information. Edit carefully — it controls the quality of deal extraction.")
+
+        prompt_col, reset_col = st.columns([4, 1])
+        with reset_col:
+            st.markdown("<br>", unsafe_allow_html=True)
+            reset_prompt = st.form_submit_button("🔄 Reset to Default", use_container_width=True)
+
+        if reset_prompt:
+            # Must happen before the text area is created in this run
+            st.session_state["system_prompt_editor"] = DEFAULT_SYSTEM_PROMPT
+            st.toast("Prompt reset to default. Click Save to apply.")
+
+        edited_prompt = st.text_area(
+            "System Prompt",
+            height=400,
+            label_visibility="collapsed",
+            key="system_prompt_editor",
+        )
+
+        st.markdown("---")
+
+        # ─── Save & Test ───
+        save_col, test_col, test_all_col = st.columns(3)
+        with save_col:
+            save_clicked = st.form_submit_button("💾 Save Settings", use_container_width=True, type="primary")
+        with test_col:
+            test_clicked = st.form_submit_button("🔗 Test Connection", use_container_width=True)
+        with test_all_col:
+            test_all_clicked = st.form_submit_button("🧪 Test All Providers", use_container_width=True)
+
+    def _persist() -> dict:
+        """Save the submitted form values if they changed, and return them."""
         new_settings = {
             "provider": selected_provider,
             "gemini": {"model": gemini_model, "api_key": gemini_key},
@@ -182,41 +252,42 @@ with save_col:
         # Clear system_prompt key if it matches default (no need to store)
         if new_settings["system_prompt"] == DEFAULT_SYSTEM_PROMPT.strip():
             new_settings["system_prompt"] = ""
-        save_settings(new_settings)
+        if new_settings != settings:
+            save_settings(new_settings)
+        return new_settings
+
+    if save_clicked:
+        _persist()
         st.success("✅ Settings saved!")
         st.rerun()
 
-with test_col:
-    if st.button("🔗 Test Connection", use_container_width=True):
+    if test_clicked:
         # Save first so test uses latest keys
-        new_settings = {
-            "provider": selected_provider,
-            "gemini": {"model": gemini_model, "api_key": gemini_key},
-            "together": {"model": together_model, "api_key": together_key},
-            "deepseek": {"model": deepseek_model, "api_key": deepseek_key},
-            "system_prompt": edited_prompt.strip(),
-        }
-        if new_settings["system_prompt"] == DEFAULT_SYSTEM_PROMPT.strip():
-            new_settings["system_prompt"] = ""
-        save_settings(new_settings)
+        new_settings = _persist()
 
         with st.spinner(f"Testing {selected_provider}..."):
-            success, msg = test_connection()
+            active = new_settings[selected_provider]
+            success, msg = _run_test(selected_provider, active["api_key"], active["model"])
             if success:
                 st.success(msg)
             else:
                 st.error(msg)
 
-# ─── Info ───
-st.markdown("---")
-st.markdown("### ℹ️ Provider Notes")
-st.markdown("""
-| Provider | Best For | Notes |
-|----------|----------|-------|
-| **Gemini** | High-quality extraction, fast | Free tier at aistudio.google.com |
-| **Together AI** | Open-source models, Qwen 3 | Good balance of quality and cost |
-| **DeepSeek** | Cost-effective, strong reasoning | OpenAI-compatible API |
-""")
+    if test_all_clicked:
+        with st.spinner("Testing all providers..."):
+            results = _test_all()
+        for provider, (success, msg) in results.items():
+            if success:
+                st.success(msg)
+            else:
+                st.error(f"{_PROVIDER_LABELS[provider]}: {msg}")
+
+    # ─── Info ───
+    st.markdown("---")
+    st.markdown("### ℹ️ Provider Notes")
+    st.markdown(_NOTES_MD)
+
+    st.caption("🔒 API keys are stored in `data/settings.json` (gitignored). For Streamlit Cloud, add them as secrets (GEMINI_API_KEY, TOGETHER_API_KEY, DEEPSEEK_API_KEY).")
 
-st.caption("🔒 API keys are stored in `data/settings.json` (gitignored). For Streamlit Cloud, add them as secrets (GEMINI_API_KEY, TOGETHER_API_KEY, DEEPSEEK_API_KEY).")
 
+_render_settings()
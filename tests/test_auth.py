@@ -0,0 +1,42 @@
+import bcrypt
+import pytest
+
+import auth
+
+_ALICE_HASH = bcrypt.hashpw(b"correct", bcrypt.gensalt(rounds=4)).decode("utf-8")
+
+
+@pytest.fixture
+def checkpw_calls(monkeypatch):
+    """Count bcrypt checks, with a single known regular user."""
+    calls = []
+    real_checkpw = bcrypt.checkpw
+
+    def counting_checkpw(password, hashed):
+        calls.append(hashed)
+        return real_checkpw(password, hashed)
+
+    monkeypatch.setattr(auth.bcrypt, "checkpw", counting_checkpw)
+    monkeypatch.setattr(auth, "_load_users", lambda: {"alice": _ALICE_HASH})
+    auth._verified.clear()
+    yield calls
+    auth._verified.clear()
+
+
+def test_repeated_failed_login_on_known_user_runs_bcrypt(checkpw_calls):
+    assert not auth.authenticate("alice", "wrong")
+    assert not auth.authenticate("alice", "wrong")
+    assert len(checkpw_calls) == 2
+
+
+def test_repeated_failed_login_on_unknown_user_runs_bcrypt(checkpw_calls):
+    assert not auth.authenticate("mallory", "wrong")
+    assert not auth.authenticate("mallory", "wrong")
+    assert len(checkpw_calls) == 2
+
+
+def test_successful_login_is_cached(checkpw_calls):
+    assert auth.authenticate("alice", "correct")
+    assert auth.authenticate("alice", "correct")
+    assert len(checkpw_calls) == 1
+